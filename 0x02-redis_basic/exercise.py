@@ -2,20 +2,243 @@
 """
 This module provides a Cache class for storing and retrieving data using Redis.
 """
+import atexit
+import base64
+import math
+import orjson
 import redis
-import uuid
-from typing import Union, Callable, Optional
+from redis_connection import connection_pool
+import secrets
+import threading
+import weakref
+from collections import defaultdict
+from typing import Union, Callable, Optional, Iterable, List
 import functools
 
+# Most recent calls kept in each :inputs/:outputs history list
+MAX_HISTORY = 10000
+
+# Records one Cache.store call server-side: bump the call counter, log the
+# input, write the value and log the returned key, all in one round trip.
+# KEYS: counter, inputs list, data key, outputs list.
+# ARGV: serialized input, value, serialized output, history length.
+STORE_SCRIPT = """
+redis.call('INCR', KEYS[1])
+redis.call('RPUSH', KEYS[2], ARGV[1])
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[4]), -1)
+redis.call('SET', KEYS[3], ARGV[2])
+redis.call('RPUSH', KEYS[4], ARGV[3])
+redis.call('LTRIM', KEYS[4], -tonumber(ARGV[4]), -1)
+return KEYS[3]
+"""
+
+# Connections shared by every Cache instance
+_POOL = connection_pool()
+
+# count_calls writes its counters to Redis once this many calls have been
+# counted locally, or this many seconds after the first unwritten call
+COUNT_FLUSH_THRESHOLD = 100
+COUNT_FLUSH_INTERVAL = 1.0
+
+# Number of history entries fetched per round trip by replay.
+REPLAY_CHUNK = 1000
+
+# Returns one window of a method's history for replay: the call count, the
+# length of the inputs list and the entries as a flat input, output, ... list.
+# KEYS: counter, inputs list, outputs list. ARGV: start, stop.
+REPLAY_SCRIPT = """
+local inputs = redis.call('LRANGE', KEYS[2], ARGV[1], ARGV[2])
+local outputs = redis.call('LRANGE', KEYS[3], ARGV[1], ARGV[2])
+local entries = {}
+for k = 1, math.min(#inputs, #outputs) do
+    entries[#entries + 1] = inputs[k]
+    entries[#entries + 1] = outputs[k]
+end
+return {redis.call('GET', KEYS[1]) or '0', redis.call('LLEN', KEYS[2]), entries}
+"""
+
+# Live call counters, flushed at interpreter exit and before Cache flushes
+# the database
+_COUNTERS = weakref.WeakSet()
+
+class _LocalCounter:
+    """
+    In-process call counts for one Redis client, written in batches with
+    INCRBY instead of one INCR per call. Pending counts are flushed every
+    COUNT_FLUSH_THRESHOLD calls, COUNT_FLUSH_INTERVAL seconds after the first
+    unflushed call, and at interpreter exit.
+    """
+    def __init__(self, client: redis.Redis) -> None:
+        """
+        Initialize an empty counter that flushes through client.
+
+        Args:
+            client: The Redis client the counts are written to.
+        """
+        self._client = client
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._count = 0
+        self._timer = None
+        _COUNTERS.add(self)
+
+    def incr(self, key: bytes) -> None:
+        """
+        Count one call for key, flushing when the threshold is reached.
+
+        Args:
+            key: The Redis counter key.
+        """
+        with self._lock:
+            self._pending[key] += 1
+            self._count += 1
+            if self._count < COUNT_FLUSH_THRESHOLD:
+                if self._timer is None:
+                    self._timer = threading.Timer(COUNT_FLUSH_INTERVAL, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            pending = self._take()
+        self._write(pending)
+
+    def flush(self) -> None:
+        """
+        Write all pending counts to Redis.
+        """
+        with self._lock:
+            pending = self._take()
+        self._write(pending)
+
+    def _take(self) -> dict:
+        """
+        Return the pending counts and reset them. Must hold the lock.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending = self._pending
+        self._pending = defaultdict(int)
+        self._count = 0
+        return pending
+
+    def _write(self, pending: dict) -> None:
+        """
+        Send one INCRBY per counter, batched in a single round trip.
+        """
+        if not pending:
+            return
+        pipe = self._client.pipeline(transaction=False)
+        for key, amount in pending.items():
+            pipe.incrby(key, amount)
+        pipe.execute()
+
+@atexit.register
+def _flush_counters() -> None:
+    """
+    Write the pending counts of every live call counter to Redis.
+    """
+    for counter in list(_COUNTERS):
+        counter.flush()
+
+def _counter(self) -> _LocalCounter:
+    """
+    Return the instance's call counter, creating it on first use.
+    """
+    counter = getattr(self, '_call_counter', None)
+    if counter is None:
+        counter = self._call_counter = _LocalCounter(self._redis)
+    return counter
+
+class _Repr(str):
+    """
+    Recorded repr of a value JSON cannot represent; repr() shows it verbatim.
+    """
+    def __repr__(self) -> str:
+        return str(self)
+
+def _encode(value) -> dict:
+    """
+    orjson default hook: tag bytes so they decode back to the same value,
+    and record any other unsupported value by its repr.
+    """
+    if isinstance(value, bytes):
+        return {'$bytes': base64.b64encode(value).decode('ascii')}
+    return {'$repr': repr(value)}
+
+def _prepare(value):
+    """
+    Tag the values orjson would encode lossily without calling _encode:
+    non-finite floats (written as null), tuples (written as lists) and user
+    dicts that look like a tag.
+    """
+    if isinstance(value, float) and not math.isfinite(value):
+        return {'$repr': repr(value)}
+    if isinstance(value, tuple):
+        return {'$repr': repr(value)}
+    if type(value) is list:
+        return [_prepare(item) for item in value]
+    if type(value) is dict:
+        if len(value) == 1 and ('$bytes' in value or '$repr' in value):
+            return {'$repr': repr(value)}
+        return {k: _prepare(v) for k, v in value.items()}
+    return value
+
+def _serialize(value) -> bytes:
+    """
+    Encode a call's output as compact JSON for the history lists.
+    """
+    return _dumps(_prepare(value), value)
+
+def _serialize_args(args: tuple) -> bytes:
+    """
+    Encode a call's positional arguments as a JSON list for the history
+    lists; replay turns the list back into a tuple.
+    """
+    return _dumps([_prepare(arg) for arg in args], args)
+
+def _dumps(prepared, value) -> bytes:
+    """
+    Encode prepared with orjson, recording value by its repr if that fails.
+    """
+    try:
+        return orjson.dumps(prepared, default=_encode)
+    except orjson.JSONEncodeError:
+        # orjson rejects integers beyond 64 bits without calling default
+        return orjson.dumps({'$repr': repr(value)})
+
+def _deserialize(data: bytes):
+    """
+    Decode a history entry written by _serialize or _serialize_args.
+    """
+    return _restore(orjson.loads(data))
+
+def _restore(value):
+    """
+    Turn the tagged objects produced by _encode back into values.
+    """
+    if isinstance(value, list):
+        return [_restore(item) for item in value]
+    if isinstance(value, dict):
+        if value.keys() == {'$bytes'}:
+            return base64.b64decode(value['$bytes'])
+        if value.keys() == {'$repr'}:
+            return _Repr(value['$repr'])
+        return {k: _restore(v) for k, v in value.items()}
+    return value
+
 def count_calls(method: Callable) -> Callable:
     """
-    Decorator to count the number of times a method is called using Redis INCR.
-    Uses the method's __qualname__ as the key.
+    Decorator to count the number of times a method is called using Redis INCRBY.
+    Uses the method's __qualname__ as the key. Calls are counted in-process
+    before the method runs and written by a per-instance _LocalCounter, so
+    the value in Redis may lag by up to COUNT_FLUSH_INTERVAL seconds; replay
+    flushes pending counts before reading.
     """
+    key = method.__qualname__.encode()
+
     @functools.wraps(method)
     def wrapper(self, *args, **kwargs):
-        key = method.__qualname__
-        self._redis.incr(key)
+        _counter(self).incr(key)
         return method(self, *args, **kwargs)
     return wrapper
 
@@ -23,14 +246,25 @@ def call_history(method: Callable) -> Callable:
     """
     Decorator to store the history of inputs and outputs for a function in Redis lists.
     Uses the method's __qualname__ with ':inputs' and ':outputs' suffixes as keys.
+    Inputs and outputs are stored JSON-encoded (see _serialize_args and
+    _serialize), and only the last MAX_HISTORY calls are kept.
+    Both pushes and their trims are sent in one pipeline, created per call,
+    once the method returns. A call that raises records nothing here, even
+    though count_calls still counts it: pushing its input without an output
+    would misalign the two lists that replay pairs up.
     """
+    input_key = f"{method.__qualname__}:inputs".encode()
+    output_key = f"{method.__qualname__}:outputs".encode()
+
     @functools.wraps(method)
     def wrapper(self, *args, **kwargs):
-        input_key = f"{method.__qualname__}:inputs"
-        output_key = f"{method.__qualname__}:outputs"
-        self._redis.rpush(input_key, str(args))
         result = method(self, *args, **kwargs)
-        self._redis.rpush(output_key, str(result))
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.rpush(input_key, _serialize_args(args))
+        pipe.ltrim(input_key, -MAX_HISTORY, -1)
+        pipe.rpush(output_key, _serialize(result))
+        pipe.ltrim(output_key, -MAX_HISTORY, -1)
+        pipe.execute()
         return result
     return wrapper
 
@@ -38,18 +272,32 @@ def replay(method: Callable) -> None:
     """
     Display the history of calls of a particular function.
     Shows the number of calls, inputs, and outputs using Redis lists.
+    The history is read REPLAY_CHUNK entries at a time so memory use stays
+    bounded however long the lists grow; each window is paired up
+    server-side by REPLAY_SCRIPT and costs one round trip.
     """
     self = method.__self__
     qualname = method.__qualname__
     inputs_key = f"{qualname}:inputs"
     outputs_key = f"{qualname}:outputs"
-    calls = self._redis.get(qualname)
-    calls_count = int(calls) if calls else 0
-    print(f"{qualname} was called {calls_count} times:")
-    inputs = self._redis.lrange(inputs_key, 0, -1)
-    outputs = self._redis.lrange(outputs_key, 0, -1)
-    for input_args, output in zip(inputs, outputs):
-        print(f"{qualname}(*{input_args.decode('utf-8')}) -> {output.decode('utf-8')}")
+    _counter(self).flush()
+    script = self._redis.register_script(REPLAY_SCRIPT)
+    start = 0
+    while True:
+        calls, length, pairs = script(
+            keys=[qualname, inputs_key, outputs_key],
+            args=[start, start + REPLAY_CHUNK - 1],
+        )
+        if start == 0:
+            print(f"{qualname} was called {int(calls)} times:")
+        for k in range(0, len(pairs), 2):
+            input_args = _deserialize(pairs[k])
+            if isinstance(input_args, list):
+                input_args = tuple(input_args)
+            print(f"{qualname}(*{input_args!r}) -> {_deserialize(pairs[k + 1])}")
+        start += REPLAY_CHUNK
+        if start >= length:
+            break
 
 class Cache:
     """
@@ -59,23 +307,82 @@ class Cache:
         """
         Initialize the Cache instance and flush the Redis database.
         """
-        self._redis = redis.Redis()
+        self._redis = redis.Redis(connection_pool=_POOL)
+        # Write counts still pending from earlier instances so flushdb clears them
+        _flush_counters()
         self._redis.flushdb()
+        self._call_counter = _LocalCounter(self._redis)
+        self._store_script = self._redis.register_script(STORE_SCRIPT)
+        qualname = self.store.__qualname__
+        self._store_key = qualname.encode()
+        self._store_inputs_key = f"{qualname}:inputs".encode()
+        self._store_outputs_key = f"{qualname}:outputs".encode()
 
-    @call_history
-    @count_calls
     def store(self, data: Union[str, bytes, int, float]) -> str:
         """
         Store the given data in Redis with a randomly generated key.
 
+        The call count and input/output history are recorded exactly as the
+        call_history and count_calls decorators would, but by a single Lua
+        script so the whole operation costs one round trip.
+
         Args:
             data: The data to store (str, bytes, int, or float).
 
         Returns:
             The key under which the data is stored.
         """
-        key = str(uuid.uuid4())
-        self._redis.set(key, data)
+        key = secrets.token_urlsafe(16)
+        self._store_script(
+            keys=[self._store_key, self._store_inputs_key, key, self._store_outputs_key],
+            args=[_serialize_args((data,)), data, _serialize(key), MAX_HISTORY],
+        )
+        return key
+
+    def bulk_store(self, items: Iterable[Union[str, bytes, int, float]]) -> List[str]:
+        """
+        Store many values at once, each under a randomly generated key.
+
+        Equivalent to calling store for every item, but the values are
+        written with one MSET and the history with variadic RPUSHes and a
+        single INCRBY, all sent in one pipeline.
+
+        Args:
+            items: The data to store (str, bytes, int, or float values).
+
+        Returns:
+            The keys under which the items are stored, in input order.
+        """
+        items = list(items)
+        if not items:
+            return []
+        keys = [secrets.token_urlsafe(16) for _ in items]
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.mset(dict(zip(keys, items)))
+        pipe.rpush(self._store_inputs_key, *[_serialize_args((item,)) for item in items])
+        pipe.rpush(self._store_outputs_key, *[_serialize(key) for key in keys])
+        pipe.ltrim(self._store_inputs_key, -MAX_HISTORY, -1)
+        pipe.ltrim(self._store_outputs_key, -MAX_HISTORY, -1)
+        pipe.incrby(self._store_key, len(items))
+        pipe.execute()
+        return keys
+
+    def store_int(self, n: int) -> str:
+        """
+        Store an integer in Redis with a randomly generated key.
+
+        Redis keeps such values int-encoded, so the slot can later be
+        updated atomically server-side with incr_by and decr_by. Unlike
+        store, the call is not recorded in the call history.
+
+        Args:
+            n: The integer to store.
+
+        Returns:
+            The key under which the integer is stored.
+        """
+        key = secrets.token_urlsafe(16)
+        self._redis.set(key, n)
         return key
 
     def get(self, key: str, fn: Optional[Callable[[bytes], Union[str, bytes, int, float]]] = None) -> Optional[Union[str, bytes, int, float]]:
@@ -106,10 +413,8 @@ class Cache:
         Returns:
             The retrieved string, or None if the key does not exist.
         """
-        data = self.get(key, fn=lambda d: d.decode('utf-8'))
-        if isinstance(data, str):
-            return data
-        return None
+        data = self._redis.get(key)
+        return data.decode('utf-8') if data is not None else None
 
     def get_int(self, key: str) -> Optional[int]:
         """
@@ -121,7 +426,34 @@ class Cache:
         Returns:
             The retrieved integer, or None if the key does not exist.
         """
-        data = self.get(key, fn=int)
-        if isinstance(data, int):
-            return data
-        return None 
\ No newline at end of file
+        data = self._redis.get(key)
+        return int(data) if data is not None else None
+
+    def incr_by(self, key: str, amount: int = 1) -> int:
+        """
+        Atomically add to an integer stored in Redis with INCRBY.
+
+        The update happens server-side in a single command, so concurrent
+        callers never lose each other's increments. A missing key counts as 0.
+
+        Args:
+            key: The key of the integer to update.
+            amount: The value to add (default: 1).
+
+        Returns:
+            The integer after the update.
+        """
+        return self._redis.incrby(key, amount)
+
+    def decr_by(self, key: str, amount: int = 1) -> int:
+        """
+        Atomically subtract from an integer stored in Redis with DECRBY.
+
+        Args:
+            key: The key of the integer to update.
+            amount: The value to subtract (default: 1).
+
+        Returns:
+            The integer after the update.
+        """
+        return self._redis.decrby(key, amount) 
\ No newline at end of file
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+This module holds the per-URL fetch lock settings shared by web.py and
+web_async.py.
+"""
+
+# Seconds a fetch lock is held at most, and delay between cache re-checks
+# while another caller is fetching the same URL
+LOCK_EXPIRY = 5
+LOCK_RETRY_DELAY = 0.05
+
+# Deletes a fetch lock only if it still holds this caller's token, so a
+# caller whose lock expired mid-fetch cannot release a newer holder's lock.
+# KEYS: lock key. ARGV: token.
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+This module chooses how exercise.py, web.py and web_async.py connect to Redis.
+"""
+import os
+import socket
+from types import ModuleType
+from typing import Optional, Union
+import redis
+import redis.asyncio
+
+# Unix socket of a co-located Redis server; set REDIS_SOCKET to '' to force TCP
+REDIS_SOCKET = os.environ.get('REDIS_SOCKET', '/tmp/redis.sock')
+
+# Most connections each pool opens; further commands wait up to
+# POOL_TIMEOUT seconds for one to be returned
+MAX_CONNECTIONS = 32
+POOL_TIMEOUT = 20
+
+def socket_path() -> Optional[str]:
+    """
+    Return REDIS_SOCKET if a Redis server is accepting connections on it.
+
+    A missing socket, or a stale one left behind by a stopped server,
+    returns None so that callers fall back to TCP.
+
+    Returns:
+        The socket path, or None to use TCP on localhost.
+    """
+    if not REDIS_SOCKET:
+        return None
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(REDIS_SOCKET)
+    except OSError:
+        return None
+    finally:
+        probe.close()
+    return REDIS_SOCKET
+
+def connection_pool(client: ModuleType = redis) -> Union[
+        redis.BlockingConnectionPool, redis.asyncio.BlockingConnectionPool]:
+    """
+    Create a connection pool over the Unix socket when one is live, and TCP
+    on localhost otherwise.
+
+    Args:
+        client: The redis module to build the pool from, redis or redis.asyncio.
+
+    Returns:
+        A blocking connection pool of MAX_CONNECTIONS connections.
+    """
+    path = socket_path()
+    if path is not None:
+        return client.BlockingConnectionPool(
+            connection_class=client.UnixDomainSocketConnection, path=path,
+            max_connections=MAX_CONNECTIONS, timeout=POOL_TIMEOUT)
+    return client.BlockingConnectionPool(
+        host='localhost', port=6379,
+        max_connections=MAX_CONNECTIONS, timeout=POOL_TIMEOUT)
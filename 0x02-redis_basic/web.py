@@ -3,13 +3,24 @@
 This module provides a web caching system with URL access tracking using Redis.
 """
 import requests
+import secrets
 import redis
+from fetch_lock import LOCK_EXPIRY, LOCK_RETRY_DELAY, RELEASE_LOCK_SCRIPT
+from redis_connection import connection_pool
+from requests.adapters import HTTPAdapter
 import time
 from typing import Optional
 from functools import wraps
 
-# Initialize Redis connection
-redis_client = redis.Redis()
+# Initialize Redis connection backed by a shared connection pool
+_POOL = connection_pool()
+redis_client = redis.Redis(connection_pool=_POOL)
+release_lock = redis_client.register_script(RELEASE_LOCK_SCRIPT)
+
+# HTTP session shared by every fetch so origin connections are kept alive
+_HTTP = requests.Session()
+_HTTP.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
+_HTTP.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
 
 def count_url_access(url: str) -> None:
     """
@@ -24,6 +35,8 @@ def count_url_access(url: str) -> None:
 def cache_with_expiry(url: str, content: str, expiry: int = 10) -> None:
     """
     Cache the content for a URL with expiration time.
+
+    Uses SET with NX so an entry written by a concurrent caller is kept.
     
     Args:
         url: The URL to cache content for.
@@ -31,7 +44,7 @@ def cache_with_expiry(url: str, content: str, expiry: int = 10) -> None:
         expiry: Expiration time in seconds (default: 10).
     """
     key = f"cache:{url}"
-    redis_client.setex(key, expiry, content)
+    redis_client.set(key, content, ex=expiry, nx=True)
 
 def get_cached_content(url: str) -> Optional[str]:
     """
@@ -58,6 +71,9 @@ def get_page(url: str) -> str:
     2. If cached, returns the cached content
     3. If not cached, fetches from URL, caches with 10-second expiry
     4. Tracks access count for the URL
+
+    Only one caller fetches a given URL at a time; concurrent callers wait
+    on a short-lived lock:<url> key and return the freshly cached content.
     
     Args:
         url: The URL to fetch HTML content from.
@@ -65,19 +81,36 @@ def get_page(url: str) -> str:
     Returns:
         The HTML content of the URL.
     """
-    # Track URL access
-    count_url_access(url)
-    
-    # Check if content is cached
-    cached_content = get_cached_content(url)
+    # Track URL access and check the cache in a single round trip
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.incr(f"count:{url}")
+    pipe.get(f"cache:{url}")
+    _, cached_content = pipe.execute()
     if cached_content:
-        return cached_content
+        return cached_content.decode('utf-8')
     
-    # Fetch content from URL
-    response = requests.get(url)
-    content = response.text
+    # Wait for any in-flight fetch of the same URL to populate the cache
+    lock_key = f"lock:{url}"
+    token = secrets.token_hex(16)
+    while not redis_client.set(lock_key, token, ex=LOCK_EXPIRY, nx=True):
+        time.sleep(LOCK_RETRY_DELAY)
+        cached_content = get_cached_content(url)
+        if cached_content:
+            return cached_content
     
-    # Cache the content with 10-second expiration
-    cache_with_expiry(url, content, 10)
+    try:
+        # A previous lock holder may have cached the page since our last check
+        cached_content = get_cached_content(url)
+        if cached_content:
+            return cached_content
+        
+        # Fetch content from URL
+        response = _HTTP.get(url, timeout=5)
+        content = response.text
+        
+        # Cache the content with 10-second expiration
+        cache_with_expiry(url, content, 10)
+    finally:
+        release_lock(keys=[lock_key], args=[token])
     
     return content 
\ No newline at end of file
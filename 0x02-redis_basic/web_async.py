@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+This module provides an asyncio version of the web caching system in web.py,
+so that many URLs can be fetched and cached concurrently from one thread.
+
+Redis and HTTP clients are bound to the event loop that first uses them, so
+each loop gets its own. Await aclose() before a loop finishes to close them:
+
+    async def main():
+        try:
+            print(await get_page(url))
+        finally:
+            await aclose()
+
+    asyncio.run(main())
+"""
+import asyncio
+import secrets
+import weakref
+from collections import namedtuple
+import httpx
+import redis.asyncio
+from typing import Optional
+from fetch_lock import LOCK_EXPIRY, LOCK_RETRY_DELAY, RELEASE_LOCK_SCRIPT
+from redis_connection import connection_pool
+
+# Redis client, its lock release script, and HTTP client (shared by every
+# fetch so origin connections are kept alive) for one event loop
+_Clients = namedtuple('_Clients', ['redis', 'release_lock', 'http'])
+
+# Clients of each event loop, dropped when the loop is garbage collected
+_CLIENTS = weakref.WeakKeyDictionary()
+
+def _clients() -> _Clients:
+    """
+    Return the clients of the running event loop, creating them on first use.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _CLIENTS.get(loop)
+    if clients is None:
+        redis_client = redis.asyncio.Redis(connection_pool=connection_pool(redis.asyncio))
+        clients = _Clients(redis_client,
+                           redis_client.register_script(RELEASE_LOCK_SCRIPT),
+                           httpx.AsyncClient(timeout=5, follow_redirects=True))
+        _CLIENTS[loop] = clients
+    return clients
+
+async def aclose() -> None:
+    """
+    Close the Redis and HTTP clients of the running event loop.
+
+    Calling get_page again on the same loop afterwards creates new clients.
+    """
+    clients = _CLIENTS.pop(asyncio.get_running_loop(), None)
+    if clients is not None:
+        await clients.http.aclose()
+        await clients.redis.aclose(close_connection_pool=True)
+
+async def cache_with_expiry(url: str, content: str, expiry: int = 10) -> None:
+    """
+    Async counterpart of web.cache_with_expiry.
+    """
+    await _clients().redis.set(f"cache:{url}", content, ex=expiry, nx=True)
+
+async def get_cached_content(url: str) -> Optional[str]:
+    """
+    Async counterpart of web.get_cached_content.
+    """
+    content = await _clients().redis.get(f"cache:{url}")
+    if content:
+        return content.decode('utf-8')
+    return None
+
+async def get_page(url: str) -> str:
+    """
+    Get the HTML content of a URL with caching and access tracking.
+
+    Behaves like web.get_page, but awaits Redis and the origin server
+    instead of blocking, so concurrent calls overlap their I/O.
+
+    Args:
+        url: The URL to fetch HTML content from.
+
+    Returns:
+        The HTML content of the URL.
+    """
+    clients = _clients()
+
+    # Track URL access and check the cache in a single round trip
+    async with clients.redis.pipeline(transaction=False) as pipe:
+        pipe.incr(f"count:{url}")
+        pipe.get(f"cache:{url}")
+        _, cached_content = await pipe.execute()
+    if cached_content:
+        return cached_content.decode('utf-8')
+
+    # Wait for any in-flight fetch of the same URL to populate the cache
+    lock_key = f"lock:{url}"
+    token = secrets.token_hex(16)
+    while not await clients.redis.set(lock_key, token, ex=LOCK_EXPIRY, nx=True):
+        await asyncio.sleep(LOCK_RETRY_DELAY)
+        cached_content = await get_cached_content(url)
+        if cached_content:
+            return cached_content
+
+    try:
+        # A previous lock holder may have cached the page since our last check
+        cached_content = await get_cached_content(url)
+        if cached_content:
+            return cached_content
+
+        # Fetch content from URL
+        response = await clients.http.get(url)
+        content = response.text
+
+        # Cache the content with 10-second expiration
+        await cache_with_expiry(url, content, 10)
+    finally:
+        await clients.release_lock(keys=[lock_key], args=[token])
+
+    return content